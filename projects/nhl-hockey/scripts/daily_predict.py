@@ -6,14 +6,18 @@ Generates predictions and saves as JSON for web dashboard
 Author: Mohammad
 """
 
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import json
-import os
+from pathlib import Path
 import warnings
-warnings.filterwarnings('ignore')
+
+from json_io import loads, save_json
+from nhl_api import create_session, setup_logging
+
+# Keep pandas performance warnings visible, they point at slow paths
+warnings.simplefilter('default', pd.errors.PerformanceWarning)
 
 # =============================================================================
 # CONFIGURATION
@@ -22,16 +26,31 @@ class Config:
     MODEL_NAME = "neural_network"
     MODEL_DISPLAY_NAME = "Neural Network v1"
     
-    DATA_DIR = "data"
-    PREDICTIONS_DIR = f"{DATA_DIR}/predictions/{MODEL_NAME}"
-    RESULTS_DIR = f"{DATA_DIR}/results"
-    HISTORICAL_FILE = f"{DATA_DIR}/historical/all_raw_stats.csv"
+    DATA_DIR = Path("data")
+    PREDICTIONS_DIR = DATA_DIR / "predictions" / MODEL_NAME
+    RESULTS_DIR = DATA_DIR / "results"
+    HISTORICAL_FILE = DATA_DIR / "historical" / "all_raw_stats.csv"
+    
+    # Read the clock once: every date and timestamp in the run derives from NOW
+    NOW = datetime.now()
+    TODAY = NOW.strftime("%Y-%m-%d")
+    DATED_FILE = PREDICTIONS_DIR / f"{TODAY}.json"
+    LATEST_FILE = PREDICTIONS_DIR / "latest.json"
+    # Seasons start in the fall, so Jan-Aug belong to last year's season
+    SEASON_START_YEAR = NOW.year if NOW.month >= 9 else NOW.year - 1
+    CURRENT_SEASON = f"{SEASON_START_YEAR}{SEASON_START_YEAR + 1}"
+    
+    MIN_GAMES_PLAYED = 3
+    SUMMARY_PAGE_SIZE = 100
     
-    TODAY = datetime.now().strftime("%Y-%m-%d")
-    CURRENT_SEASON = "20242025"
+    # Concurrent HTTP requests (the NHL API calls are I/O-bound)
+    MAX_WORKERS = 32
 
-os.makedirs(Config.PREDICTIONS_DIR, exist_ok=True)
-os.makedirs(Config.RESULTS_DIR, exist_ok=True)
+SESSION = create_session(Config.MAX_WORKERS, cache_name=Config.DATA_DIR / ".http_cache")
+log = setup_logging(__name__)
+
+Config.PREDICTIONS_DIR.mkdir(parents=True, exist_ok=True)
+Config.RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
 print("=" * 70)
 print(f"🏒 NHL GOAL PREDICTOR - {Config.MODEL_DISPLAY_NAME}")
@@ -44,11 +63,11 @@ print("=" * 70)
 def get_todays_games(date):
     url = f"https://api-web.nhle.com/v1/schedule/{date}"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = SESSION.get(url, timeout=10)
         if resp.status_code != 200:
             return []
         
-        data = resp.json()
+        data = loads(resp.content)
         games = []
         
         for day in data.get('gameWeek', []):
@@ -79,12 +98,9 @@ if not todays_games:
         "games": [],
         "players_count": 0,
         "predictions": [],
-        "generated_at": datetime.now().isoformat()
+        "generated_at": Config.NOW.isoformat()
     }
-    with open(f"{Config.PREDICTIONS_DIR}/{Config.TODAY}.json", 'w') as f:
-        json.dump(output, f, indent=2)
-    with open(f"{Config.PREDICTIONS_DIR}/latest.json", 'w') as f:
-        json.dump(output, f, indent=2)
+    save_json(output, Config.DATED_FILE, Config.LATEST_FILE)
     exit()
 
 print(f"✅ Found {len(todays_games)} games")
@@ -92,82 +108,111 @@ print(f"✅ Found {len(todays_games)} games")
 # =============================================================================
 # 2. GET PLAYER STATS FROM API (Current Season)
 # =============================================================================
-def get_player_current_stats(player_id):
-    """Get current season stats for a player from NHL API"""
+def fetch_league_skater_summary(season):
+    """Get regular season totals for every league skater in a few paged requests"""
+    url = "https://api.nhle.com/stats/rest/en/skater/summary"
+    rows = []
+    
+    try:
+        while True:
+            params = {
+                'start': len(rows),
+                'limit': Config.SUMMARY_PAGE_SIZE,
+                'sort': '[{"property":"playerId","direction":"ASC"}]',
+                'factCayenneExp': f"gamesPlayed>={Config.MIN_GAMES_PLAYED}",
+                'cayenneExp': f"seasonId={season} and gameTypeId=2",
+            }
+            resp = SESSION.get(url, params=params, timeout=10)
+            if resp.status_code != 200:
+                raise RuntimeError(f"page at {len(rows)} returned {resp.status_code}")
+            
+            page = loads(resp.content).get('data', [])
+            if not page:
+                break
+            rows.extend(page)
+    except Exception as e:
+        # Pages are sorted by player id, so a partial table would silently
+        # drop the newest players; rank nobody instead
+        print(f"❌ Error fetching skater summary: {e}")
+        rows = []
+    
+    # Season counts fit in int16 and player ids in int32
+    summary = pd.DataFrame(rows, columns=['playerId', 'gamesPlayed', 'goals', 'shots'])
+    summary = summary.drop_duplicates('playerId', keep='last').fillna(0)
+    return summary.astype({'playerId': 'int32', 'gamesPlayed': 'int16', 'goals': 'int16', 'shots': 'int16'}).set_index('playerId')
+
+def round_like_python(series, ndigits):
+    """Round each value with Python's round(); pandas' scale-and-round can differ in the last digit"""
+    return pd.Series([round(x, ndigits) for x in series.tolist()], index=series.index, dtype='float64')
+
+def calculate_player_features(summary):
+    """Derive season features for the given skaters at once, indexed by player id"""
+    games_played = summary['gamesPlayed']
+    goals = summary['goals']
+    shots = summary['shots']
+    
+    features = pd.DataFrame({
+        'games_played': games_played,
+        'season_goals': goals,
+        'season_shots': shots,
+        'avg_goals': round_like_python((goals / games_played).where(games_played > 0, 0), 3),
+        'avg_shots': round_like_python((shots / games_played).where(games_played > 0, 0), 2),
+        'shooting_pct': round_like_python((goals / shots).where(shots > 0, 0), 3),
+    })
+    return features
+
+def get_player_last5(player_id):
+    """Get last 5 games goals/points for a player from NHL API"""
     url = f"https://api-web.nhle.com/v1/player/{player_id}/landing"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = SESSION.get(url, timeout=10)
         if resp.status_code != 200:
             return None
         
-        data = resp.json()
-        
-        # Get current season stats
-        featured_stats = data.get('featuredStats', {})
-        regular_season = featured_stats.get('regularSeason', {})
-        sub_season = regular_season.get('subSeason', {})
-        
-        if not sub_season:
-            return None
-        
-        games_played = sub_season.get('gamesPlayed', 0)
-        if games_played < 1:
-            return None
-        
-        goals = sub_season.get('goals', 0)
-        shots = sub_season.get('shots', 0)
-        points = sub_season.get('points', 0)
-        
-        # Get last 5 games
-        last5 = data.get('last5Games', [])
-        last5_goals = sum(g.get('goals', 0) for g in last5)
-        last5_points = sum(g.get('points', 0) for g in last5)
-        
+        last5 = loads(resp.content).get('last5Games', [])
         return {
-            'games_played': games_played,
-            'season_goals': goals,
-            'season_shots': shots,
-            'avg_goals': round(goals / games_played, 3) if games_played > 0 else 0,
-            'avg_shots': round(shots / games_played, 2) if games_played > 0 else 0,
-            'shooting_pct': round(goals / shots, 3) if shots > 0 else 0,
-            'last5_goals': last5_goals,
-            'last5_points': last5_points,
+            'last5_goals': sum(g.get('goals', 0) for g in last5),
+            'last5_points': sum(g.get('points', 0) for g in last5),
         }
     except Exception as e:
         return None
 
-def get_team_roster_with_stats(team_abbrev):
-    """Get team roster with current season stats"""
+def get_team_roster_with_stats(team_abbrev, eligible_ids, pool):
+    """Get team roster with last 5 games stats (fetched on pool)"""
     url = f"https://api-web.nhle.com/v1/roster/{team_abbrev}/current"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = SESSION.get(url, timeout=10)
         if resp.status_code != 200:
             return []
         
-        data = resp.json()
-        players = []
+        data = loads(resp.content)
         
-        for group in ['forwards', 'defensemen']:
-            for p in data.get(group, []):
-                player_id = p['id']
-                name = f"{p['firstName']['default']} {p['lastName']['default']}"
-                position = p['positionCode']
-                
-                # Get current stats
-                stats = get_player_current_stats(player_id)
-                
-                if stats and stats['games_played'] >= 3:
-                    players.append({
-                        'player_id': player_id,
-                        'name': name,
-                        'position': position,
-                        'team': team_abbrev,
-                        **stats
-                    })
+        # Only players with enough games this season need a landing page call
+        roster = [
+            (p['id'], f"{p['firstName']['default']} {p['lastName']['default']}", p['positionCode'])
+            for group in ['forwards', 'defensemen']
+            for p in data.get(group, [])
+            if p['id'] in eligible_ids
+        ]
+        
+        last5_futures = [pool.submit(get_player_last5, player_id) for player_id, _, _ in roster]
+        
+        players = []
+        for (player_id, name, position), future in zip(roster, last5_futures):
+            last5 = future.result()
+            
+            if last5:
+                players.append({
+                    'player_id': player_id,
+                    'name': name,
+                    'position': position,
+                    'team': team_abbrev,
+                    **last5
+                })
         
         return players
     except Exception as e:
-        print(f"   ⚠️ Error fetching {team_abbrev}: {e}")
+        log.warning("   ⚠️ Error fetching %s: %s", team_abbrev, e)
         return []
 
 # =============================================================================
@@ -175,17 +220,23 @@ def get_team_roster_with_stats(team_abbrev):
 # =============================================================================
 print("\n👥 Fetching rosters and stats...")
 
-all_teams = set()
-for g in todays_games:
-    all_teams.add(g['home_team'])
-    all_teams.add(g['away_team'])
+all_teams = {team for g in todays_games for team in (g['home_team'], g['away_team'])}
+
+league_summary = fetch_league_skater_summary(Config.CURRENT_SEASON)
+eligible_ids = set(league_summary.index[league_summary['gamesPlayed'] >= Config.MIN_GAMES_PLAYED].tolist())
+print(f"   League skaters with {Config.MIN_GAMES_PLAYED}+ games: {len(eligible_ids)}")
 
 all_players = []
-for team in sorted(all_teams):
-    print(f"   Fetching {team}...", end=" ")
-    roster = get_team_roster_with_stats(team)
-    all_players.extend(roster)
-    print(f"{len(roster)} players")
+teams = sorted(all_teams)
+
+# Rosters are fetched in parallel; each roster fans its player lookups out to
+# a shared pool. map() keeps team order so tied probabilities rank the same.
+with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as player_pool, \
+        ThreadPoolExecutor(max_workers=len(teams)) as team_pool:
+    rosters = team_pool.map(lambda team: get_team_roster_with_stats(team, eligible_ids, player_pool), teams)
+    for team, roster in zip(teams, rosters):
+        all_players.extend(roster)
+        log.info("   %s: %d players", team, len(roster))
 
 print(f"\n✅ Total players with stats: {len(all_players)}")
 
@@ -199,63 +250,60 @@ if len(all_players) == 0:
         "games": todays_games,
         "players_count": 0,
         "predictions": [],
-        "generated_at": datetime.now().isoformat()
+        "generated_at": Config.NOW.isoformat()
     }
-    with open(f"{Config.PREDICTIONS_DIR}/{Config.TODAY}.json", 'w') as f:
-        json.dump(output, f, indent=2)
-    with open(f"{Config.PREDICTIONS_DIR}/latest.json", 'w') as f:
-        json.dump(output, f, indent=2)
+    save_json(output, Config.DATED_FILE, Config.LATEST_FILE)
     exit()
 
+# Players are kept column-wise from here on; records are rebuilt for output.
+# Season features are only derived for the skaters playing today.
+roster_df = pd.DataFrame(all_players)
+features = calculate_player_features(league_summary.loc[roster_df['player_id'].unique()])
+players_df = (
+    roster_df[['player_id', 'name', 'position', 'team']]
+    .join(features, on='player_id')
+    .join(roster_df[['last5_goals', 'last5_points']])
+)
+
 # =============================================================================
 # 4. ADD MATCHUP INFO
 # =============================================================================
 print("\n🏒 Adding matchup info...")
 
-game_matchups = {}
-for g in todays_games:
-    game_matchups[g['home_team']] = {'opponent': g['away_team'], 'is_home': True, 'game_id': g['game_id']}
-    game_matchups[g['away_team']] = {'opponent': g['home_team'], 'is_home': False, 'game_id': g['game_id']}
-
-for player in all_players:
-    team = player['team']
-    if team in game_matchups:
-        player['opponent'] = game_matchups[team]['opponent']
-        player['is_home'] = game_matchups[team]['is_home']
-        player['game_id'] = game_matchups[team]['game_id']
-        player['matchup'] = f"{team} vs {player['opponent']}" if player['is_home'] else f"{team} @ {player['opponent']}"
+# One row per team playing today
+matchups_df = pd.DataFrame(
+    [{'team': g['home_team'], 'opponent': g['away_team'], 'is_home': True, 'game_id': g['game_id']} for g in todays_games] +
+    [{'team': g['away_team'], 'opponent': g['home_team'], 'is_home': False, 'game_id': g['game_id']} for g in todays_games]
+)
+players_df = players_df.merge(matchups_df, on='team', how='left')
+players_df['matchup'] = np.where(
+    players_df['is_home'],
+    players_df['team'] + ' vs ' + players_df['opponent'],
+    players_df['team'] + ' @ ' + players_df['opponent'],
+)
 
 # =============================================================================
 # 5. CALCULATE GOAL PROBABILITY
 # =============================================================================
 print("\n🧠 Calculating probabilities...")
 
-for player in all_players:
-    # Simple but effective formula based on our analysis
-    prob = (
-        player.get('avg_goals', 0) * 0.40 +
-        player.get('avg_shots', 0) * 0.08 +
-        player.get('last5_goals', 0) * 0.05 +
-        player.get('shooting_pct', 0) * 0.15
-    )
-    player['goal_probability_raw'] = prob
+# Simple but effective formula based on our analysis
+prob_raw = (
+    players_df['avg_goals'] * 0.40 +
+    players_df['avg_shots'] * 0.08 +
+    players_df['last5_goals'] * 0.05 +
+    players_df['shooting_pct'] * 0.15
+)
 
 # Normalize
-max_prob = max(p['goal_probability_raw'] for p in all_players) if all_players else 1
-for player in all_players:
-    player['goal_probability'] = round(
-        min(max(player['goal_probability_raw'] / max_prob * 0.55, 0.02), 0.60),
-        3
-    )
-    del player['goal_probability_raw']
-
-# Sort by probability
-all_players.sort(key=lambda x: x['goal_probability'], reverse=True)
-
-# Add rank and hot indicator
-for i, player in enumerate(all_players):
-    player['rank'] = i + 1
-    player['is_hot'] = player.get('last5_goals', 0) >= 3
+players_df['goal_probability'] = round_like_python((prob_raw / prob_raw.max() * 0.55).clip(0.02, 0.60), 3)
+
+# Sort by probability (stable, so ties keep roster order), add rank and hot indicator
+players_df = players_df.sort_values('goal_probability', ascending=False, kind='stable', ignore_index=True)
+players_df['rank'] = np.arange(1, len(players_df) + 1)
+players_df['is_hot'] = players_df['last5_goals'] >= 3
+
+all_players = players_df.to_dict('records')
 
 # =============================================================================
 # 6. SAVE OUTPUT
@@ -270,20 +318,13 @@ output = {
     "games": todays_games,
     "players_count": len(all_players),
     "predictions": all_players,
-    "generated_at": datetime.now().isoformat()
+    "generated_at": Config.NOW.isoformat()
 }
 
-# Save dated file
-dated_file = f"{Config.PREDICTIONS_DIR}/{Config.TODAY}.json"
-with open(dated_file, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
-print(f"✅ Saved: {dated_file}")
-
-# Save latest
-latest_file = f"{Config.PREDICTIONS_DIR}/latest.json"
-with open(latest_file, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
-print(f"✅ Saved: {latest_file}")
+# Dated archive (indented with PRETTY=1) plus a separate compact latest.json
+save_json(output, Config.DATED_FILE, Config.LATEST_FILE)
+print(f"✅ Saved: {Config.DATED_FILE}")
+print(f"✅ Saved: {Config.LATEST_FILE}")
 
 # Console output - Top 20
 print("\n" + "=" * 70)
@@ -7,23 +7,42 @@ Compares with Top 10 predictions
 Author: Mohammad G. Nasiri
 """
 
-import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
 import os
 from datetime import datetime, timedelta
+from pathlib import Path
+
+from json_io import load_json, loads, save_json
+from nhl_api import create_session, setup_logging
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 class Config:
-    DATA_DIR = "data"
-    RESULTS_DIR = f"{DATA_DIR}/results"
-    PREDICTIONS_DIR = f"{DATA_DIR}/predictions"
+    DATA_DIR = Path("data")
+    RESULTS_DIR = DATA_DIR / "results"
+    PREDICTIONS_DIR = DATA_DIR / "predictions"
+    # Scorers of finished games, keyed by game_id (boxscores no longer change)
+    SCORERS_CACHE_DIR = RESULTS_DIR / "_cache"
+    FINAL_GAME_STATES = ('OFF', 'FINAL')
+    # Games worth a boxscore request (OVER = ended, not yet official)
+    COMPLETED_GAME_STATES = ('OFF', 'FINAL', 'OVER')
+    
+    NOW = datetime.now()
+    YESTERDAY = (NOW - timedelta(days=1)).strftime("%Y-%m-%d")
+    DATED_FILE = RESULTS_DIR / f"{YESTERDAY}.json"
+    LATEST_FILE = RESULTS_DIR / "latest.json"
     
-    YESTERDAY = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    # Concurrent boxscore requests (bounded to stay gentle on the NHL API)
+    MAX_WORKERS = 10
+
+SESSION = create_session(Config.MAX_WORKERS, cache_name=Config.DATA_DIR / ".http_cache")
+log = setup_logging(__name__)
 
 # Create directories
-os.makedirs(Config.RESULTS_DIR, exist_ok=True)
+Config.SCORERS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 print("=" * 60)
 print("🏒 NHL GOAL PREDICTOR - FETCH RESULTS")
@@ -38,11 +57,11 @@ def get_games(date):
     url = f"https://api-web.nhle.com/v1/schedule/{date}"
     
     try:
-        response = requests.get(url, timeout=15)
+        response = SESSION.get(url, timeout=15)
         if response.status_code != 200:
             return []
         
-        data = response.json()
+        data = loads(response.content)
         games = []
         
         for day in data.get('gameWeek', []):
@@ -66,75 +85,65 @@ def get_games(date):
 # =============================================================================
 # FETCH GOAL SCORERS
 # =============================================================================
+@dataclass(slots=True)
+class Scorer:
+    """One goal scorer in a game (game_id/matchup are filled in per game)"""
+    player_id: int
+    player_name: str
+    team: str
+    goals: int
+    game_id: int = 0
+    matchup: str = ""
+
+def player_display_name(player):
+    """Handle a boxscore player name given as dict or string"""
+    name = player.get('name', {})
+    if isinstance(name, dict):
+        return name.get('default', 'Unknown')
+    return str(name) if name else 'Unknown'
+
 def get_scorers(game_id):
-    """Get all goal scorers from a game's boxscore"""
+    """Get all goal scorers from a game's boxscore (cached once the game is final)"""
     url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/boxscore"
+    cache_file = Config.SCORERS_CACHE_DIR / f"{game_id}.json"
     
     try:
-        response = requests.get(url, timeout=15)
+        return [Scorer(**s) for s in load_json(cache_file)]
+    except (FileNotFoundError, ValueError, TypeError):
+        pass
+    
+    try:
+        response = SESSION.get(url, timeout=15)
         if response.status_code != 200:
-            print(f"   ⚠️ API returned {response.status_code}")
+            log.warning("   ⚠️ Boxscore %s: API returned %s", game_id, response.status_code)
             return []
         
-        data = response.json()
-        scorers = []
+        data = loads(response.content)
         
-        # NEW API STRUCTURE: playerByGameStats
+        # NEW API STRUCTURE: players under playerByGameStats (away first),
+        # FALLBACK: old structure with players under each team (home first)
         player_stats = data.get('playerByGameStats')
-        
         if player_stats:
-            for team_type in ['awayTeam', 'homeTeam']:
-                team_data = player_stats.get(team_type, {})
-                
-                # Get team abbrev from main data
-                team_abbrev = data.get(team_type, {}).get('abbrev', '')
-                
-                # Check forwards and defense
-                for position_group in ['forwards', 'defense']:
-                    for player in team_data.get(position_group, []):
-                        goals = player.get('goals', 0)
-                        if goals > 0:
-                            # Handle name as dict or string
-                            name = player.get('name', {})
-                            if isinstance(name, dict):
-                                player_name = name.get('default', 'Unknown')
-                            else:
-                                player_name = str(name) if name else 'Unknown'
-                            
-                            scorers.append({
-                                'player_id': player.get('playerId'),
-                                'player_name': player_name,
-                                'team': team_abbrev,
-                                'goals': goals
-                            })
+            team_groups = [(t, player_stats.get(t, {})) for t in ('awayTeam', 'homeTeam')]
         else:
-            # FALLBACK: Old structure
-            for team_type in ['homeTeam', 'awayTeam']:
-                team_data = data.get(team_type, {})
-                team_abbrev = team_data.get('abbrev', '')
-                
-                players = team_data.get('forwards', []) + team_data.get('defense', [])
-                
-                for player in players:
-                    goals = player.get('goals', 0)
-                    if goals > 0:
-                        name = player.get('name', {})
-                        if isinstance(name, dict):
-                            player_name = name.get('default', 'Unknown')
-                        else:
-                            player_name = str(name) if name else 'Unknown'
-                        
-                        scorers.append({
-                            'player_id': player.get('playerId'),
-                            'player_name': player_name,
-                            'team': team_abbrev,
-                            'goals': goals
-                        })
+            team_groups = [(t, data.get(t, {})) for t in ('homeTeam', 'awayTeam')]
+        
+        # Only walk abbrev, forwards/defense goals and scorer id/name
+        abbrevs = {t: data.get(t, {}).get('abbrev', '') for t in ('homeTeam', 'awayTeam')}
+        scorers = [
+            Scorer(player.get('playerId'), player_display_name(player), abbrevs[team_type], player['goals'])
+            for team_type, team_data in team_groups
+            for player in chain(team_data.get('forwards', ()), team_data.get('defense', ()))
+            if player.get('goals', 0) > 0
+        ]
+        
+        if data.get('gameState') in Config.FINAL_GAME_STATES:
+            save_json(scorers, cache_file)
         
         return scorers
         
     except Exception as e:
-        print(f"   ⚠️ Error fetching boxscore: {e}")
+        log.warning("   ⚠️ Error fetching boxscore %s: %s", game_id, e)
         return []
 
 # =============================================================================
@@ -156,14 +165,11 @@ if not games:
         "all_scorers": [],
         "scorers_count": 0,
         "model_comparisons": [],
-        "fetched_at": datetime.now().isoformat()
+        "fetched_at": Config.NOW.isoformat()
     }
     
     # Save files
-    with open(f"{Config.RESULTS_DIR}/{Config.YESTERDAY}.json", 'w') as f:
-        json.dump(output, f, indent=2)
-    with open(f"{Config.RESULTS_DIR}/latest.json", 'w') as f:
-        json.dump(output, f, indent=2)
+    save_json(output, Config.DATED_FILE, Config.LATEST_FILE)
     
     print("✅ Saved empty results (no games)")
     exit()
@@ -173,87 +179,90 @@ print(f"✅ Found {len(games)} games")
 # 2. Get all scorers
 print("\n⚽ Fetching goal scorers...")
 all_scorers = []
+scorer_ids = set()
 
+# Future/live games have no final goals yet, so don't request their boxscores
+completed_games = [g for g in games if g['game_state'] in Config.COMPLETED_GAME_STATES]
 for game in games:
-    matchup = f"{game['away_team']} @ {game['home_team']}"
-    print(f"   {matchup}...", end=" ")
-    
-    scorers = get_scorers(game['game_id'])
-    
-    for scorer in scorers:
-        scorer['game_id'] = game['game_id']
-        scorer['matchup'] = matchup
+    if game['game_state'] not in Config.COMPLETED_GAME_STATES:
+        log.info("   %s @ %s... skipped (%s)", game['away_team'], game['home_team'], game['game_state'] or 'unknown state')
+
+# Boxscores are independent, fetch them in parallel (map keeps game order)
+with ThreadPoolExecutor(max_workers=max(1, min(Config.MAX_WORKERS, len(completed_games)))) as pool:
+    game_scorers = pool.map(lambda g: get_scorers(g['game_id']), completed_games)
     
-    all_scorers.extend(scorers)
-    print(f"{len(scorers)} scorers")
+    for game, scorers in zip(completed_games, game_scorers):
+        matchup = f"{game['away_team']} @ {game['home_team']}"
+        
+        for scorer in scorers:
+            scorer.game_id = game['game_id']
+            scorer.matchup = matchup
+        
+        all_scorers.extend(scorers)
+        scorer_ids.update(int(s.player_id) for s in scorers if s.player_id is not None)
+        log.info("   %s... %d scorers", matchup, len(scorers))
 
 print(f"\n✅ Total scorers: {len(all_scorers)}")
 
 # 3. Compare with predictions
 print("\n📊 Comparing with predictions...")
 
-scorer_ids = set(s['player_id'] for s in all_scorers)
+# Ids are ints on both sides so string ids from the API still match
+scorer_ids = frozenset(scorer_ids)
+
 model_comparisons = []
 
-# Check each model
-if os.path.exists(Config.PREDICTIONS_DIR):
-    for model_name in os.listdir(Config.PREDICTIONS_DIR):
-        model_dir = f"{Config.PREDICTIONS_DIR}/{model_name}"
-        
-        if not os.path.isdir(model_dir):
-            continue
-        
-        pred_file = f"{model_dir}/{Config.YESTERDAY}.json"
-        
-        if not os.path.exists(pred_file):
-            continue
-        
-        # Load predictions
-        with open(pred_file, 'r') as f:
-            predictions = json.load(f)
-        
-        # Get Top 10
-        top10 = predictions.get('predictions', [])[:10]
-        
-        if not top10:
-            print(f"   ⚠️ {model_name}: No predictions")
-            continue
-        
-        # Check each prediction
-        hits = 0
-        top10_picks = []
-        
-        for pred in top10:
-            scored = pred['player_id'] in scorer_ids
-            if scored:
-                hits += 1
-            
-            top10_picks.append({
-                'rank': pred.get('rank', 0),
-                'player_id': pred['player_id'],
-                'name': pred['name'],
-                'team': pred['team'],
-                'probability': pred.get('goal_probability', 0),
-                'scored': scored
-            })
-        
-        # Save comparison
-        model_comparisons.append({
-            'model': model_name,
-            'model_display_name': predictions.get('model_display_name', model_name),
-            'top10_picks': top10_picks,
-            'hits': hits,
-            'total_predictions': 10,
-            'hit_rate': round(hits / 10 * 100, 1)
-        })
-        
-        # Print results
-        print(f"\n   📈 {model_name}:")
-        for p in top10_picks:
-            icon = "✅" if p['scored'] else "❌"
-            print(f"      {p['rank']:>2}. {p['name']:<24} {p['probability']*100:>5.1f}% {icon}")
-        print(f"      {'─' * 45}")
-        print(f"      Result: {hits}/10 ({round(hits/10*100)}%)")
+# Check each model (one directory per model, DirEntry caches is_dir)
+try:
+    with os.scandir(Config.PREDICTIONS_DIR) as entries:
+        model_dirs = sorted((e for e in entries if e.is_dir()), key=lambda e: e.name)
+except FileNotFoundError:
+    model_dirs = []
+
+for model_dir in model_dirs:
+    model_name = model_dir.name
+    
+    # Load predictions (a model may have skipped this date)
+    try:
+        predictions = load_json(Path(model_dir.path, f"{Config.YESTERDAY}.json"))
+    except FileNotFoundError:
+        continue
+    
+    # Get Top 10
+    top10 = predictions.get('predictions', [])[:10]
+    
+    if not top10:
+        print(f"   ⚠️ {model_name}: No predictions")
+        continue
+    
+    # Check each prediction (one set lookup per pick)
+    top10_picks = [{
+        'rank': pred.get('rank', 0),
+        'player_id': pred['player_id'],
+        'name': pred['name'],
+        'team': pred['team'],
+        'probability': pred.get('goal_probability', 0),
+        'scored': int(pred['player_id']) in scorer_ids
+    } for pred in top10]
+    hits = sum(p['scored'] for p in top10_picks)
+    
+    # Save comparison
+    model_comparisons.append({
+        'model': model_name,
+        'model_display_name': predictions.get('model_display_name', model_name),
+        'top10_picks': top10_picks,
+        'hits': hits,
+        'total_predictions': 10,
+        'hit_rate': round(hits / 10 * 100, 1)
+    })
+    
+    # Print results
+    print(f"\n   📈 {model_name}:")
+    for p in top10_picks:
+        icon = "✅" if p['scored'] else "❌"
+        print(f"      {p['rank']:>2}. {p['name']:<24} {p['probability']*100:>5.1f}% {icon}")
+    print(f"      {'─' * 45}")
+    print(f"      Result: {hits}/10 ({round(hits/10*100)}%)")
 
 # 4. Save results
 print("\n💾 Saving results...")
@@ -265,20 +274,13 @@ output = {
     "all_scorers": all_scorers,
     "scorers_count": len(all_scorers),
     "model_comparisons": model_comparisons,
-    "fetched_at": datetime.now().isoformat()
+    "fetched_at": Config.NOW.isoformat()
 }
 
-# Save dated file
-dated_file = f"{Config.RESULTS_DIR}/{Config.YESTERDAY}.json"
-with open(dated_file, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
-print(f"✅ Saved: {dated_file}")
-
-# Save latest
-latest_file = f"{Config.RESULTS_DIR}/latest.json"
-with open(latest_file, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
-print(f"✅ Saved: {latest_file}")
+# Dated archive (indented with PRETTY=1) plus a separate compact latest.json
+save_json(output, Config.DATED_FILE, Config.LATEST_FILE)
+print(f"✅ Saved: {Config.DATED_FILE}")
+print(f"✅ Saved: {Config.LATEST_FILE}")
 
 # 5. Summary
 print("\n" + "=" * 60)
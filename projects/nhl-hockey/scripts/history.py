@@ -0,0 +1,135 @@
+"""
+NHL Goal Predictor - Results History
+====================================
+Loads the daily result files once per process
+
+Each file is reduced to the fields the stats need, and summaries are
+cached on disk by file name and content digest, so only new or changed
+files are parsed. The cache holds no timestamps, so it only changes when
+a result file is added or edited and stays stable across checkouts.
+It is tagged with SUMMARY_VERSION, so a change to the summarizer forces
+one full re-parse instead of reusing stale summaries.
+
+Author: Mohammad G. Nasiri
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from json_io import load_json, loads, save_json
+
+# Non-date files in the results directory
+_SKIP = frozenset(('latest.json', 'stats.json'))
+
+# Result files are read concurrently (small files, I/O-bound)
+MAX_WORKERS = min(8, os.cpu_count() or 4)
+
+# Bump whenever summarize_result() changes, so cached summaries are rebuilt
+SUMMARY_VERSION = 1
+
+def summarize_result(data):
+    """Keep only the fields the stats need from a full result file"""
+    return {
+        'date': data.get('date'),
+        'games_count': data.get('games_count', 0),
+        'model_comparisons': [
+            {
+                'model': comp.get('model'),
+                'hits': comp.get('hits', 0),
+                'total_predictions': comp.get('total_predictions', 10),
+            }
+            for comp in data.get('model_comparisons', [])
+        ],
+    }
+
+def load_summary_cache(cache_file):
+    """Load the per-file summary cache, empty if missing, unreadable or from another SUMMARY_VERSION"""
+    try:
+        cache = load_json(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != SUMMARY_VERSION:
+        return {}
+    files = cache.get('files')
+    return files if isinstance(files, dict) else {}
+
+def is_valid_entry(entry):
+    """True if a cache entry has the shape load_result() writes"""
+    if not isinstance(entry, dict) or not isinstance(entry.get('digest'), str):
+        return False
+    summary = entry.get('summary')
+    if summary is None:
+        return True
+    return (
+        isinstance(summary, dict)
+        and isinstance(summary.get('games_count'), int)
+        and isinstance(summary.get('model_comparisons'), list)
+        and all(
+            isinstance(comp, dict) and {'model', 'hits', 'total_predictions'} <= comp.keys()
+            for comp in summary['model_comparisons']
+        )
+    )
+
+def load_result(entry, cached=None):
+    """Summarize one result file into a cache entry, reusing cached if the content is unchanged
+    
+    The summary is None if the file is unreadable or there were no games.
+    """
+    try:
+        raw = Path(entry.path).read_bytes()
+    except OSError:
+        return None
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    
+    # Malformed entries (e.g. a hand-edited cache) count as misses
+    if is_valid_entry(cached) and cached['digest'] == digest:
+        return {'digest': digest, 'summary': cached.get('summary')}
+    
+    try:
+        data = loads(raw)
+    except Exception:
+        data = None
+    # Only include days with actual games; scorers and picks are dropped
+    summary = summarize_result(data) if data and data.get('games_count', 0) > 0 else None
+    
+    return {'digest': digest, 'summary': summary}
+
+@lru_cache(maxsize=1)
+def load_history(results_dir, cache_file=None):
+    """Return (file name, summary) pairs for result files with games, sorted by date
+    
+    Memoized, so every caller in the same process shares one scan.
+    Treat the returned summaries as read-only.
+    """
+    # One directory read; DirEntry carries the name and full path
+    try:
+        with os.scandir(results_dir) as entries:
+            result_files = sorted(
+                (e for e in entries if e.name.endswith('.json') and e.name not in _SKIP),
+                key=lambda e: e.name,
+            )
+    except FileNotFoundError:
+        result_files = []
+    
+    summary_cache = load_summary_cache(cache_file) if cache_file else {}
+    new_cache = {}
+    history = []
+    
+    # map() yields in input order, so history stays sorted by date
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        cached = [summary_cache.get(e.name) for e in result_files]
+        for entry, loaded in zip(result_files, pool.map(load_result, result_files, cached)):
+            if loaded is None:
+                continue
+            new_cache[entry.name] = loaded
+            if loaded['summary'] is not None:
+                history.append((entry.name, loaded['summary']))
+    
+    if cache_file and new_cache != summary_cache:
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        save_json({'version': SUMMARY_VERSION, 'files': new_cache}, cache_file)
+    
+    return tuple(history)
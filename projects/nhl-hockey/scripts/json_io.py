@@ -0,0 +1,70 @@
+"""
+NHL Goal Predictor - JSON I/O
+=============================
+JSON helpers shared by the scripts
+
+Uses orjson when installed, falls back to the standard library.
+Output is compact; PRETTY=1 indents the dated archive files only (the
+ones saved together with a latest.json copy), and files are replaced
+atomically so readers never see partial JSON.
+
+Author: Mohammad G. Nasiri
+"""
+
+import dataclasses
+import json
+import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PRETTY = bool(os.environ.get('PRETTY'))
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_json(path):
+    """Read and parse a JSON file in binary mode"""
+    return loads(Path(path).read_bytes())
+
+def _default(obj):
+    """Serialize dataclasses with the stdlib encoder (orjson does this natively)"""
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj, pretty=PRETTY):
+    """Serialize to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+def write_bytes_atomic(path, data):
+    """Write to a temporary sibling file, then rename it over path"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def save_json(obj, path, *copies):
+    """Atomically write obj to path and compact copies (e.g. latest.json) for machine readers
+    
+    With PRETTY set, path is indented only when copies are given, i.e. for
+    the dated archives; stats and cache files are always compact.
+    """
+    compact = dumps(obj, pretty=False)
+    write_bytes_atomic(path, dumps(obj, pretty=True) if PRETTY and copies else compact)
+    for target in copies:
+        write_bytes_atomic(target, compact)
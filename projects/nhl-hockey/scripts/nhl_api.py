@@ -0,0 +1,123 @@
+"""
+NHL Goal Predictor - API Session
+================================
+Shared HTTP session for the NHL API scripts
+
+Slow-changing responses (rosters, player pages, the skater summary) are
+cached on disk when requests-cache is installed, so reruns skip the
+network. Requests that do reach the network share a token bucket, so
+worker threads stay under the rate limit.
+
+Author: Mohammad G. Nasiri
+"""
+
+import logging
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+# Transient API errors are retried with backoff instead of returning no data
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    raise_on_status=False,
+)
+
+# Cache lifetime in seconds per URL pattern; anything else is never cached.
+# Schedules and boxscores change as games go live and finish, so they always
+# hit the API (finished boxscores are cached as scorers by fetch_results.py)
+CACHE_EXPIRY = {
+    "api-web.nhle.com/v1/roster/*": 3600,
+    "api-web.nhle.com/v1/player/*/landing": 3600,
+    "api.nhle.com/stats/rest/en/skater/summary*": 3600,
+}
+
+# Sustained requests per second across all threads, and the allowed burst
+RATE_LIMIT = 15
+RATE_BURST = 15
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a token is free"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so other threads can refill and check
+            time.sleep(wait)
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a token before each request it sends"""
+    
+    def __init__(self, bucket, **kwargs):
+        self.bucket = bucket
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        # Cache hits never reach the adapter, so they cost no tokens
+        self.bucket.acquire()
+        return super().send(request, **kwargs)
+
+def setup_logging(name):
+    """Return the named logger, printing one complete line per record to stdout
+    
+    Worker threads log whole lines, so their progress never interleaves.
+    The handler sits on this logger only (not the root), so INFO records
+    from third-party libraries stay out of the output.
+    """
+    log = logging.getLogger(name)
+    if not log.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return log
+
+def create_session(pool_size, cache_name=None, rate_limit=RATE_LIMIT, burst=RATE_BURST):
+    """Create a pooled, retrying, rate-limited session, backed by an SQLite response cache if available
+    
+    Meant to be shared by a script's worker threads, so they reuse pooled
+    keep-alive connections and one rate limit.
+    """
+    if requests_cache is not None and cache_name:
+        session = requests_cache.CachedSession(
+            cache_name,
+            backend='sqlite',
+            urls_expire_after={**CACHE_EXPIRY, "*": requests_cache.DO_NOT_CACHE},
+            allowable_codes=(200,),
+        )
+    else:
+        session = requests.Session()
+    
+    adapter = RateLimitedAdapter(
+        TokenBucket(rate_limit, burst),
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=RETRY,
+    )
+    session.mount("https://", adapter)
+    return session
@@ -7,142 +7,171 @@ Does NOT touch index.html
 Author: Mohammad G. Nasiri
 """
 
-import json
-import os
+from collections import defaultdict
 from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from history import load_history
+from json_io import load_json, save_json
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 class Config:
-    DATA_DIR = "data"
-    RESULTS_DIR = f"{DATA_DIR}/results"
-    STATS_FILE = f"{DATA_DIR}/stats.json"
-
-print("=" * 60)
-print("📊 NHL GOAL PREDICTOR - UPDATE STATS")
-print("=" * 60)
+    DATA_DIR = Path("data")
+    RESULTS_DIR = DATA_DIR / "results"
+    STATS_FILE = DATA_DIR / "stats.json"
+    # Per-file summaries from the last run, keyed by file name
+    STATS_CACHE_FILE = DATA_DIR / "stats.cache.json"
+    
+    NOW = datetime.now()
 
 # =============================================================================
 # LOAD ALL RESULT FILES
 # =============================================================================
-def load_json(filepath):
-    """Safely load a JSON file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return None
-
-print("\n📂 Loading result files...")
-
-results = []
-
-if os.path.exists(Config.RESULTS_DIR):
-    for filename in sorted(os.listdir(Config.RESULTS_DIR)):
-        # Skip non-date files
-        if not filename.endswith('.json'):
-            continue
-        if filename in ['latest.json', 'stats.json']:
-            continue
-        
-        filepath = f"{Config.RESULTS_DIR}/{filename}"
-        data = load_json(filepath)
-        
-        # Only include days with actual games
-        if data and data.get('games_count', 0) > 0:
-            results.append(data)
-            print(f"   ✅ {filename} ({data.get('games_count')} games)")
-
-print(f"\n✅ Loaded {len(results)} result files with games")
+def load_results():
+    """Load the summaries of all result files with games, sorted by date"""
+    print("\n📂 Loading result files...")
+    
+    history = load_history(Config.RESULTS_DIR, Config.STATS_CACHE_FILE)
+    for filename, summary in history:
+        print(f"   ✅ {filename} ({summary['games_count']} games)")
+    
+    print(f"\n✅ Loaded {len(history)} result files with games")
+    return [summary for _, summary in history]
 
 # =============================================================================
 # CALCULATE MODEL STATS
 # =============================================================================
-print("\n📈 Calculating model stats...")
-
-# Find all models
-model_names = set()
-for result in results:
-    for comp in result.get('model_comparisons', []):
-        if comp.get('model'):
-            model_names.add(comp['model'])
-
-print(f"   Models found: {model_names or 'None'}")
-
-# Calculate stats per model
-model_stats = {}
-
-for model_name in model_names:
-    total_hits = 0
-    total_predictions = 0
-    daily_results = []
+def calculate_model_stats(results):
+    """Aggregate overall, last-7-day and last-30-day stats per model"""
+    print("\n📈 Calculating model stats...")
+    
+    # Single pass over all results, bucketing each day's comparison by model
+    daily_by_model = defaultdict(list)
     
     for result in results:
         for comp in result.get('model_comparisons', []):
-            if comp.get('model') == model_name:
-                hits = comp.get('hits', 0)
-                total = comp.get('total_predictions', 10)
-                
-                total_hits += hits
-                total_predictions += total
-                
-                daily_results.append({
-                    'date': result.get('date'),
-                    'hits': hits,
-                    'total': total,
-                    'hit_rate': round(hits / total * 100, 1) if total > 0 else 0
-                })
+            if not comp.get('model'):
+                continue
+            
+            # (date, hits, total); dicts are only built for the published days
+            daily_by_model[comp['model']].append(
+                (result.get('date'), comp.get('hits', 0), comp.get('total_predictions', 10))
+            )
     
-    # Calculate aggregates
-    hit_rate = (total_hits / total_predictions * 100) if total_predictions > 0 else 0
-    avg_hits = (total_hits / len(daily_results)) if daily_results else 0
+    print(f"   Models found: {set(daily_by_model) or 'None'}")
     
-    # Last 7 days stats
-    last_7 = daily_results[-7:] if len(daily_results) >= 7 else daily_results
-    last_7_hits = sum(d['hits'] for d in last_7)
-    last_7_total = sum(d['total'] for d in last_7)
-    last_7_rate = (last_7_hits / last_7_total * 100) if last_7_total > 0 else 0
+    # Calculate stats per model
+    model_stats = {}
     
-    model_stats[model_name] = {
-        'total_days': len(daily_results),
-        'total_hits': total_hits,
-        'total_predictions': total_predictions,
-        'hit_rate': round(hit_rate, 1),
-        'avg_hits_per_day': round(avg_hits, 2),
-        'last_7_days': {
-            'days': len(last_7),
-            'hits': last_7_hits,
-            'total': last_7_total,
-            'hit_rate': round(last_7_rate, 1)
-        },
-        'daily_results': daily_results[-30:]  # Last 30 days
-    }
+    for model_name, rows in daily_by_model.items():
+        # Numeric columns as arrays, so the sums are vectorized reductions
+        days = len(rows)
+        hits = np.fromiter((r[1] for r in rows), dtype=np.int64, count=days)
+        totals = np.fromiter((r[2] for r in rows), dtype=np.int64, count=days)
+        
+        total_hits = int(hits.sum())
+        total_predictions = int(totals.sum())
+        
+        # Calculate aggregates
+        hit_rate = (total_hits / total_predictions * 100) if total_predictions > 0 else 0
+        avg_hits = (total_hits / days) if rows else 0
+        
+        # Last 7 days stats
+        last_7_days = min(days, 7)
+        last_7_hits = int(hits[-7:].sum())
+        last_7_total = int(totals[-7:].sum())
+        last_7_rate = (last_7_hits / last_7_total * 100) if last_7_total > 0 else 0
+        
+        # Per-day hit rates, only for the 30 days that are published
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recent_rates = (hits[-30:] / totals[-30:] * 100).tolist()
+        recent = [
+            {
+                'date': date,
+                'hits': day_hits,
+                'total': total,
+                'hit_rate': round(rate, 1) if total > 0 else 0
+            }
+            for (date, day_hits, total), rate in zip(rows[-30:], recent_rates)
+        ]
+        
+        model_stats[model_name] = {
+            'total_days': days,
+            'total_hits': total_hits,
+            'total_predictions': total_predictions,
+            'hit_rate': round(hit_rate, 1),
+            'avg_hits_per_day': round(avg_hits, 2),
+            'last_7_days': {
+                'days': last_7_days,
+                'hits': last_7_hits,
+                'total': last_7_total,
+                'hit_rate': round(last_7_rate, 1)
+            },
+            'daily_results': recent  # Last 30 days
+        }
+        
+        print(f"\n   📊 {model_name}:")
+        print(f"      Days tracked: {days}")
+        print(f"      Total: {total_hits}/{total_predictions} ({round(hit_rate, 1)}%)")
+        print(f"      Last 7: {last_7_hits}/{last_7_total} ({round(last_7_rate, 1)}%)")
     
-    print(f"\n   📊 {model_name}:")
-    print(f"      Days tracked: {len(daily_results)}")
-    print(f"      Total: {total_hits}/{total_predictions} ({round(hit_rate, 1)}%)")
-    print(f"      Last 7: {last_7_hits}/{last_7_total} ({round(last_7_rate, 1)}%)")
+    return model_stats
 
 # =============================================================================
 # SAVE STATS
 # =============================================================================
-print("\n💾 Saving stats...")
-
-output = {
-    "generated_at": datetime.now().isoformat(),
-    "total_days_tracked": len(results),
-    "models": model_stats
-}
-
-# Ensure directory exists
-os.makedirs(Config.DATA_DIR, exist_ok=True)
+def stats_unchanged(output):
+    """True if STATS_FILE already holds these stats (generated_at aside)"""
+    try:
+        previous = load_json(Config.STATS_FILE)
+    except (OSError, ValueError):
+        return False
+    if not isinstance(previous, dict):
+        return False
+    
+    previous.pop('generated_at', None)
+    return previous == {k: v for k, v in output.items() if k != 'generated_at'}
 
-with open(Config.STATS_FILE, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
+def save_stats(results, model_stats):
+    """Write stats.json, unless it already holds the same stats"""
+    print("\n💾 Saving stats...")
+    
+    output = {
+        "generated_at": Config.NOW.isoformat(),
+        "total_days_tracked": len(results),
+        "models": model_stats
+    }
+    
+    # Ensure directory exists
+    Config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Unchanged results leave stats.json and its generated_at alone; together
+    # with the digest-keyed summary cache, this run then writes nothing
+    if stats_unchanged(output):
+        print(f"ℹ️  Unchanged: {Config.STATS_FILE}")
+    else:
+        save_json(output, Config.STATS_FILE)
+        print(f"✅ Saved: {Config.STATS_FILE}")
 
-print(f"✅ Saved: {Config.STATS_FILE}")
+# =============================================================================
+# MAIN
+# =============================================================================
+def main():
+    print("=" * 60)
+    print("📊 NHL GOAL PREDICTOR - UPDATE STATS")
+    print("=" * 60)
+    
+    results = load_results()
+    model_stats = calculate_model_stats(results)
+    save_stats(results, model_stats)
+    
+    print("\n" + "=" * 60)
+    print("✅ Stats update complete!")
+    print("=" * 60)
 
-print("\n" + "=" * 60)
-print("✅ Stats update complete!")
-print("=" * 60)
+if __name__ == "__main__":
+    main()